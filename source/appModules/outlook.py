@@ -4,6 +4,12 @@
 # This file is covered by the GNU General Public License.
 # See the file COPYING for more details.
 
+from typing import (
+	Callable,
+	Dict,
+	Optional,
+	Tuple,
+)
 from comtypes import COMError
 from comtypes.hresult import S_OK
 import comtypes.client
@@ -46,6 +52,14 @@ from NVDAObjects.UIA.wordDocument import WordDocument as UIAWordDocument
 import languageHandler
 
 PR_LAST_VERB_EXECUTED=0x10810003
+#: The flags of a message. MSGFLAG_READ is set once the message has been read.
+PR_MESSAGE_FLAGS = "http://schemas.microsoft.com/mapi/proptag/0x0E070003"
+MSGFLAG_READ = 0x1
+#: Whether a message has attachments, as shown by Outlook's attachment column.
+#: Unlike Attachments.Count, inline and hidden attachments are not counted.
+PR_HASATTACH = "http://schemas.microsoft.com/mapi/proptag/0x0E1B000B"
+PR_IMPORTANCE = "http://schemas.microsoft.com/mapi/proptag/0x00170003"
+PR_MESSAGE_CLASS = "http://schemas.microsoft.com/mapi/proptag/0x001A001F"
 VERB_REPLYTOSENDER=102
 VERB_REPLYTOALL=103
 VERB_FORWARD=104
@@ -59,6 +73,19 @@ executedVerbLabels={
 }
 
 
+#: The (window class name, control ID) pairs of the windows hosting Outlook's message lists.
+_SUPERGRID_WINDOWS = frozenset({
+	("SUPERGRID", 4704),
+	("rctrl_renwnd32", 109),
+})
+
+#: Prefixes of the window class names of auto complete lists.
+_AUTO_COMPLETE_WINDOW_CLASS_PREFIXES = ("REListBox", "NetUIHWND")
+
+#: The window class names of the calendar's day and week views.
+#: These are handled by L{CalendarView} through IAccessible, so UIA is never used for them.
+_CALENDAR_VIEW_WINDOW_CLASSES = frozenset({"WeekViewWnd", "DayViewWnd"})
+
 #: The number of seconds in a day, used to make all day appointments and selections less verbose.
 #: Type: float
 SECONDS_PER_DAY = 86400.0
@@ -70,32 +97,63 @@ importanceLabels={
 	0:_("low importance"),
 }
 
+# Translators: This is presented in outlook or live mail, email subject
+_SUBJECT = _("subject: %s")
+# Translators: This is presented in outlook or live mail, email received time
+_RECEIVED = _("received: %s")
+# Translators: This is presented in outlook or live mail, email sent date
+_SENT = _("sent: %s")
+# Translators: This is presented in outlook or live mail, indicating an unread email
+_UNREAD = _("unread")
+# Translators: This is presented in outlook or live mail, indicating email attachments
+_ATTACHMENT = _("attachment")
+
+
 def getContactString(obj):
-		return ", ".join([x for x in [obj.fullName,obj.companyName,obj.jobTitle,obj.email1address] if x and not x.isspace()])
+	parts = (obj.fullName, obj.companyName, obj.jobTitle, obj.email1address)
+	return ", ".join(x for x in parts if x and not x.isspace())
 
 def getReceivedMessageString(obj):
-	nameList=[]
-	nameList.append(obj.senderName)
-	# Translators: This is presented in outlook or live mail, email subject
-	nameList.append(_("subject: %s")%obj.subject)
-	# Translators: This is presented in outlook or live mail, email received time
-	nameList.append(_("received: %s")%obj.receivedTime)
-
-	text=", ".join(nameList)
+	text = f"{obj.senderName}, {_SUBJECT % obj.subject}, {_RECEIVED % obj.receivedTime}"
 	if obj.unread:
-		text="%s %s"%(_("unread"),text)
-	if obj.attachments.count>0:
-		# Translators: This is presented in outlook or live mail, indicating email attachments
-		text="%s %s"%(_("attachment"),text)
+		text = f"{_UNREAD} {text}"
+	if obj.attachments.count > 0:
+		text = f"{_ATTACHMENT} {text}"
 	return text
 
 def getSentMessageString(obj):
-	nameList=[]
-	nameList.append(obj.to)
-	nameList.append(_("subject: %s")%obj.subject)
-	# Translators: This is presented in outlook or live mail, email sent date
-	nameList.append(_("sent: %s")%obj.sentOn)
-	return ", ".join(nameList)
+	return f"{obj.to}, {_SUBJECT % obj.subject}, {_SENT % obj.sentOn}"
+
+
+def _getSelectionProperties(selection):
+	"""Fetches the unread state, attachment state, importance and message class of an Outlook item.
+	All properties are fetched with one PropertyAccessor.GetProperties call,
+	rather than a cross-process call for each property.
+	Properties that could not be fetched are returned as their defaults.
+	@returns: a tuple of (unread, hasAttachment, importance, messageClass)
+	"""
+	unread = False
+	hasAttachment = False
+	importance = 1
+	messageClass = None
+	try:
+		messageFlags, hasAttach, itemImportance, itemMessageClass = selection.PropertyAccessor.GetProperties(
+			(PR_MESSAGE_FLAGS, PR_HASATTACH, PR_IMPORTANCE, PR_MESSAGE_CLASS)
+		)
+	except (COMError, ValueError, TypeError):
+		log.debugWarning("Unable to fetch properties of the selected item", exc_info=True)
+		return unread, hasAttachment, importance, messageClass
+	# Properties which can not be fetched are returned as error codes, so only accept expected values.
+	if isinstance(messageFlags, int) and messageFlags >= 0:
+		unread = not (messageFlags & MSGFLAG_READ)
+	if isinstance(hasAttach, bool):
+		hasAttachment = hasAttach
+	if itemImportance in importanceLabels:
+		importance = itemImportance
+	if isinstance(itemMessageClass, str):
+		messageClass = itemMessageClass
+	return unread, hasAttachment, importance, messageClass
+
 
 class AppModule(appModuleHandler.AppModule):
 
@@ -153,10 +211,24 @@ class AppModule(appModuleHandler.AppModule):
 		self.nativeOm=nativeOm
 		return self.nativeOm
 
+	#: Cached for the duration of a core cycle,
+	#: so that all the handlers reporting a focus change share one cross-process call.
+	_cache_activeExplorer = True
+
+	def _get_activeExplorer(self):
+		"""The active explorer of Outlook's native object model, or C{None} if the object model is unavailable."""
+		nativeOm = self.nativeOm
+		if not nativeOm:
+			return None
+		return nativeOm.activeExplorer()
+
 	def _get_outlookVersion(self):
 		nativeOm=self.nativeOm
 		if nativeOm:
 			outlookVersion=int(nativeOm.version.split('.')[0])
+			# The version can not change while Outlook is running,
+			# so avoid fetching it from the object model on every focus change.
+			self.outlookVersion = outlookVersion
 		else:
 			outlookVersion=0
 		return outlookVersion
@@ -170,7 +242,7 @@ class AppModule(appModuleHandler.AppModule):
 				versionMajor=int(self.productVersion.split('.')[0])
 				if versionMajor<16:
 					return True
-		if windowClass in ("WeekViewWnd","DayViewWnd"):
+		if windowClass in _CALENDAR_VIEW_WINDOW_CLASSES:
 			return True
 		return False
 
@@ -189,7 +261,7 @@ class AppModule(appModuleHandler.AppModule):
 			obj.description=None
 		if role in (controlTypes.Role.TREEVIEW,controlTypes.Role.TREEVIEWITEM,controlTypes.Role.LIST,controlTypes.Role.LISTITEM):
 			obj.shouldAllowIAccessibleFocusEvent=True
-		if ((windowClassName=="SUPERGRID" and controlID==4704) or (windowClassName=="rctrl_renwnd32" and controlID==109)) and role==controlTypes.Role.UNKNOWN:
+		if role == controlTypes.Role.UNKNOWN and (windowClassName, controlID) in _SUPERGRID_WINDOWS:
 			obj.role=controlTypes.Role.LISTITEM
 
 	def chooseNVDAObjectOverlayClasses(self, obj, clsList):
@@ -202,7 +274,7 @@ class AppModule(appModuleHandler.AppModule):
 		windowClassName=obj.windowClassName
 		# AutoComplete listItems.
 		# This class is abstract enough to  support both UIA and MSAA
-		if role==controlTypes.Role.LISTITEM and (windowClassName.startswith("REListBox") or windowClassName.startswith("NetUIHWND")):
+		if role == controlTypes.Role.LISTITEM and windowClassName.startswith(_AUTO_COMPLETE_WINDOW_CLASS_PREFIXES):
 			clsList.insert(0,AutoCompleteListItem)
 		#  all   remaining classes are IAccessible
 		if not isinstance(obj,IAccessible):
@@ -215,7 +287,6 @@ class AppModule(appModuleHandler.AppModule):
 				clsList.remove(Dialog)
 		if WordDocument in clsList:
 			clsList.insert(0,OutlookWordDocument)
-		states=obj.states
 		controlID=obj.windowControlID
 		# Support the date picker in Outlook Meeting / Appointment creation forms 
 		if controlID==4352 and role==controlTypes.Role.BUTTON:
@@ -227,7 +298,7 @@ class AppModule(appModuleHandler.AppModule):
 		if role==controlTypes.Role.LISTITEM and windowClassName=="OUTEXVLB":
 			clsList.insert(0, AddressBookEntry)
 			return
-		if (windowClassName=="SUPERGRID" and controlID==4704) or (windowClassName=="rctrl_renwnd32" and controlID==109):
+		if (windowClassName, controlID) in _SUPERGRID_WINDOWS:
 			outlookVersion=self.outlookVersion
 			if (
 				outlookVersion
@@ -236,7 +307,7 @@ class AppModule(appModuleHandler.AppModule):
 				and obj.event_childID==0
 			):
 				clsList.insert(0,SuperGridClient2010)
-		if (windowClassName == "AfxWndW" and controlID==109) or (windowClassName in ("WeekViewWnd","DayViewWnd")):
+		if (windowClassName == "AfxWndW" and controlID == 109) or windowClassName in _CALENDAR_VIEW_WINDOW_CLASSES:
 			clsList.insert(0,CalendarView)
 
 class REListBox20W_CheckBox(IAccessible):
@@ -263,7 +334,7 @@ class SuperGridClient2010(IAccessible):
 
 	def event_gainFocus(self):
 		# #3834: UIA has a much better implementation for rows, so use it if available.
-		if self.appModule.outlookVersion<14 or not UIAHandler.handler:
+		if not UIAHandler.handler or self.appModule.outlookVersion < 14:
 			return super(SuperGridClient2010,self).event_gainFocus()
 		try:
 			kwargs = {}
@@ -284,24 +355,31 @@ class AddressBookEntry(IAccessible):
 		gesture.send()
 		eventHandler.queueEvent("nameChange",self)
 
-	__moveByEntryGestures = (
-		"kb:downArrow",
-		"kb:upArrow",
-		"kb:home",
-		"kb:end",
-		"kb:delete",
-	)
-
-	def initOverlayClass(self):
-		for gesture in self.__moveByEntryGestures:
-			self.bindGesture(gesture, "moveByEntry")
+	__gestures = {
+		"kb:downArrow": "moveByEntry",
+		"kb:upArrow": "moveByEntry",
+		"kb:home": "moveByEntry",
+		"kb:end": "moveByEntry",
+		"kb:delete": "moveByEntry",
+	}
 
 class AutoCompleteListItem(Window):
 
+	#: States which mean a selected item is not actually shown to the user.
+	_hiddenStates = frozenset({
+		controlTypes.State.INVISIBLE,
+		controlTypes.State.UNAVAILABLE,
+		controlTypes.State.OFFSCREEN,
+	})
+
 	def event_stateChange(self):
 		states=self.states
 		focus=api.getFocusObject()
-		if (focus.role==controlTypes.Role.EDITABLETEXT or focus.role==controlTypes.Role.BUTTON) and controlTypes.State.SELECTED in states and controlTypes.State.INVISIBLE not in states and controlTypes.State.UNAVAILABLE not in states and controlTypes.State.OFFSCREEN not in states:
+		if (
+			focus.role in (controlTypes.Role.EDITABLETEXT, controlTypes.Role.BUTTON)
+			and controlTypes.State.SELECTED in states
+			and states.isdisjoint(self._hiddenStates)
+		):
 			speech.cancelSpeech()
 			text=self.name
 			# Some newer versions of Outlook don't put the contact as the name of the listItem, rather it is on the parent 
@@ -315,13 +393,54 @@ class CalendarView(IAccessible):
 
 	_lastStartDate=None
 
+	#: Formatted dates and times, keyed by (format kind, date or time key).
+	#: Only set while L{reportFocus} runs, so that one report formats each date and time once.
+	_formatCache: Optional[Dict[Tuple[int, int], str]] = None
+	_FORMAT_KIND_DATE = 0
+	_FORMAT_KIND_TIME = 1
+
+	def _getCachedFormat(self, kind: int, key: int, formatter: Callable[[], str]) -> str:
+		if self._formatCache is None:
+			return formatter()
+		cacheKey = (kind, key)
+		text = self._formatCache.get(cacheKey)
+		if text is None:
+			text = self._formatCache[cacheKey] = formatter()
+		return text
+
+	def _formatDate(self, dateTime) -> str:
+		"""Formats the date of dateTime as a long date in the user's locale."""
+		return self._getCachedFormat(
+			self._FORMAT_KIND_DATE,
+			dateTime.year << 9 | dateTime.month << 5 | dateTime.day,
+			lambda: winKernel.GetDateFormatEx(
+				winKernel.LOCALE_NAME_USER_DEFAULT,
+				winKernel.DATE_LONGDATE,
+				dateTime,
+				None
+			)
+		)
+
+	def _formatTime(self, dateTime) -> str:
+		"""Formats the time of dateTime without seconds in the user's locale."""
+		return self._getCachedFormat(
+			self._FORMAT_KIND_TIME,
+			dateTime.hour << 6 | dateTime.minute,
+			lambda: winKernel.GetTimeFormatEx(
+				winKernel.LOCALE_NAME_USER_DEFAULT,
+				winKernel.TIME_NOSECONDS,
+				dateTime,
+				None
+			)
+		)
+
 	def _generateTimeRangeText(self,startTime,endTime):
-		startText=winKernel.GetTimeFormatEx(winKernel.LOCALE_NAME_USER_DEFAULT, winKernel.TIME_NOSECONDS, startTime, None)
-		endText=winKernel.GetTimeFormatEx(winKernel.LOCALE_NAME_USER_DEFAULT, winKernel.TIME_NOSECONDS, endTime, None)
+		startText = self._formatTime(startTime)
+		endText = self._formatTime(endTime)
 		startDate=startTime.date()
 		endDate=endTime.date()
 		if not CalendarView._lastStartDate or startDate!=CalendarView._lastStartDate or endDate!=startDate: 
-			startDateText=winKernel.GetDateFormatEx(winKernel.LOCALE_NAME_USER_DEFAULT, winKernel.DATE_LONGDATE, startTime, None)
+			startDateText = self._formatDate(startTime)
 			startText="%s %s"%(startDateText,startText)
 		CalendarView._lastStartDate=startDate
 		if endDate!=startDate:
@@ -330,7 +449,7 @@ class CalendarView(IAccessible):
 			):
 				# Translators: a message reporting the date of a all day Outlook calendar entry
 				return _("{date} (all day)").format(date=startDateText)
-			endText="%s %s"%(winKernel.GetDateFormatEx(winKernel.LOCALE_NAME_USER_DEFAULT, winKernel.DATE_LONGDATE, endTime, None),endText)
+			endText = "%s %s" % (self._formatDate(endTime), endText)
 		# Translators: a message reporting the time range (i.e. start time to end time) of an Outlook calendar entry
 		return _("{startTime} to {endTime}").format(startTime=startText,endTime=endText)
 
@@ -368,8 +487,17 @@ class CalendarView(IAccessible):
 		pass
 
 	def reportFocus(self):
+		# Only memoize formatted dates and times for the duration of this report,
+		# so that a change to the user's regional settings is never masked.
+		self._formatCache = {}
+		try:
+			self._reportFocus()
+		finally:
+			self._formatCache = None
+
+	def _reportFocus(self):
 		if self.appModule.outlookVersion>=13 and self.appModule.nativeOm:
-			e=self.appModule.nativeOm.activeExplorer()
+			e = self.appModule.activeExplorer
 			s=e.selection
 			if s.count>0:
 				p=s.item(1)
@@ -396,35 +524,23 @@ class CalendarView(IAccessible):
 				except COMError:
 					return super(CalendarView,self).reportFocus()
 				timeSlotText=self._generateTimeRangeText(selectedStartTime,selectedEndTime)
-				startDate = winKernel.GetDateFormatEx(
-					winKernel.LOCALE_NAME_USER_DEFAULT,
-					winKernel.DATE_LONGDATE,
-					selectedStartTime,
-					None
-				)
-				startTime = winKernel.GetTimeFormatEx(
-					winKernel.LOCALE_NAME_USER_DEFAULT,
-					winKernel.TIME_NOSECONDS,
-					selectedStartTime,
-					None
-				)
-				endDate = winKernel.GetDateFormatEx(
-					winKernel.LOCALE_NAME_USER_DEFAULT,
-					winKernel.DATE_LONGDATE,
-					selectedEndTime,
-					None
-				)
-				endTime = winKernel.GetTimeFormatEx(
-					winKernel.LOCALE_NAME_USER_DEFAULT,
-					winKernel.TIME_NOSECONDS,
-					selectedEndTime,
-					None
-				)
+				startDate = self._formatDate(selectedStartTime)
+				startTime = self._formatTime(selectedStartTime)
+				endDate = self._formatDate(selectedEndTime)
+				endTime = self._formatTime(selectedEndTime)
 				query = f'[Start] < "{endDate} {endTime}" And [End] > "{startDate} {startTime}"'
 				i=e.currentFolder.items
+				# Only fetch the properties needed to find an appointment,
+				# rather than every property of every item in the folder.
+				try:
+					i.SetColumns("Start,End,Subject")
+				except COMError:
+					log.debugWarning("Unable to restrict calendar item columns", exc_info=True)
 				i.sort('[Start]')
 				i.IncludeRecurrences =True
-				if i.find(query):
+				# Restrict lets Outlook answer from its indexed table, rather than walking the items to the first match.
+				# Count is not valid when recurrences are included, so check for a first item instead.
+				if i.Restrict(query).GetFirst():
 					# Translators: a message when the current time slot on an Outlook Calendar has an appointment
 					timeSlotText=_("Has appointment")+" "+timeSlotText
 				ui.message(timeSlotText)
@@ -438,23 +554,21 @@ class UIAGridRow(RowWithFakeNavigation,UIA):
 
 	def _get_name(self):
 		textList=[]
-		if controlTypes.State.EXPANDED in self.states:
+		states = self.states
+		if controlTypes.State.EXPANDED in states:
 			textList.append(controlTypes.State.EXPANDED.displayString)
-		elif controlTypes.State.COLLAPSED in self.states:
+		elif controlTypes.State.COLLAPSED in states:
 			textList.append(controlTypes.State.COLLAPSED.displayString)
 		selection=None
 		if self.appModule.nativeOm:
 			try:
-				selection=self.appModule.nativeOm.activeExplorer().selection.item(1)
+				selection = self.appModule.activeExplorer.selection.item(1)
 			except COMError:
 				pass
 		if selection:
-			try:
-				unread=selection.unread
-			except COMError:
-				unread=False
-			# Translators: when an email is unread
-			if unread: textList.append(_("unread"))
+			unread, hasAttachment, importance, messageClass = _getSelectionProperties(selection)
+			if unread:
+				textList.append(_UNREAD)
 			try:
 				mapiObject=selection.mapiObject
 			except COMError:
@@ -472,28 +586,23 @@ class UIAGridRow(RowWithFakeNavigation,UIA):
 					verbLabel=executedVerbLabels.get(v.value,None)
 					if verbLabel:
 						textList.append(verbLabel)
-			try:
-				attachmentCount=selection.attachments.count
-			except COMError:
-				attachmentCount=0
-			# Translators: when an email has attachments
-			if attachmentCount>0: textList.append(_("has attachment"))
-			try:
-				importance=selection.importance
-			except COMError:
-				importance=1
+			if hasAttachment:
+				# Translators: when an email has attachments
+				textList.append(_("has attachment"))
 			importanceLabel=importanceLabels.get(importance)
 			if importanceLabel: textList.append(importanceLabel)
-			try:
-				messageClass=selection.messageClass
-			except COMError:
-				messageClass=None
 			if messageClass=="IPM.Schedule.Meeting.Request":
 				# Translators: the email is a meeting request
 				textList.append(_("meeting request"))
+		reportColumnHeaders = config.conf['documentFormatting']['reportTableHeaders'] in (
+			ReportTableHeaders.ROWS_AND_COLUMNS,
+			ReportTableHeaders.COLUMNS,
+		)
 		childrenCacheRequest=UIAHandler.handler.baseCacheRequest.clone()
 		childrenCacheRequest.addProperty(UIAHandler.UIA_NamePropertyId)
-		childrenCacheRequest.addProperty(UIAHandler.UIA_TableItemColumnHeaderItemsPropertyId)
+		if reportColumnHeaders:
+			# Only fetch the column headers of the children if they will be reported.
+			childrenCacheRequest.addProperty(UIAHandler.UIA_TableItemColumnHeaderItemsPropertyId)
 		childrenCacheRequest.TreeScope=UIAHandler.TreeScope_Children
 		# We must filter the children for just text and image elements otherwise getCachedChildren fails completely in conversation view.
 		childrenCacheRequest.treeFilter=createUIAMultiPropertyCondition({UIAHandler.UIA_ControlTypePropertyId:[UIAHandler.UIA_TextControlTypeId,UIAHandler.UIA_ImageControlTypeId]})
@@ -527,10 +636,7 @@ class UIAGridRow(RowWithFakeNavigation,UIA):
 				continue
 			name=e.cachedName
 			columnHeaderTextList=[]
-			if name and config.conf['documentFormatting']['reportTableHeaders'] in (
-				ReportTableHeaders.ROWS_AND_COLUMNS,
-				ReportTableHeaders.COLUMNS,
-			):
+			if name and reportColumnHeaders:
 				columnHeaderItems=e.getCachedPropertyValueEx(UIAHandler.UIA_TableItemColumnHeaderItemsPropertyId,True)
 			else:
 				columnHeaderItems=None
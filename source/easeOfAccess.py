@@ -6,6 +6,7 @@
 """Utilities for working with the Windows Ease of Access Center.
 """
 
+import ctypes
 from enum import Enum, IntEnum
 from typing import Any, List
 
@@ -49,13 +50,13 @@ class AutoStartContext(IntEnum):
 
 def isRegistered() -> bool:
 	try:
-		winreg.OpenKey(
+		with winreg.OpenKey(
 			winreg.HKEY_LOCAL_MACHINE,
 			RegistryKey.APP.value,
 			0,
 			winreg.KEY_READ | winreg.KEY_WOW64_64KEY
-		)
-		return True
+		):
+			return True
 	except FileNotFoundError:
 		log.debug("Unable to find AT registry key")
 	except WindowsError:
@@ -75,22 +76,22 @@ def notify(signal):
 			keys.append((vk, False))
 	keys.append((0x5B, True)) # leftWindows
 	keys.append((0x55, True)) # u
-	inputs = []
-	# Release unwanted keys and press desired keys.
-	for vk, desired in keys:
-		input = winUser.Input(type=winUser.INPUT_KEYBOARD)
-		input.ii.ki.wVk = vk
-		if not desired:
-			input.ii.ki.dwFlags = winUser.KEYEVENTF_KEYUP
-		inputs.append(input)
-	# Release desired keys and press unwanted keys.
-	for vk, desired in reversed(keys):
-		input = winUser.Input(type=winUser.INPUT_KEYBOARD)
-		input.ii.ki.wVk = vk
+	n = len(keys) * 2
+	# Fill a ctypes INPUT array directly,
+	# rather than building a list of Input structures which SendInput must copy into one.
+	inputs = (winUser.Input * n)()
+	# The first half releases unwanted keys and presses desired keys.
+	# The second half mirrors it in reverse order, pressing unwanted keys and releasing desired keys.
+	for i, (vk, desired) in enumerate(keys):
+		first = inputs[i]
+		last = inputs[n - 1 - i]
+		first.type = last.type = winUser.INPUT_KEYBOARD
+		first.ii.ki.wVk = last.ii.ki.wVk = vk
 		if desired:
-			input.ii.ki.dwFlags = winUser.KEYEVENTF_KEYUP
-		inputs.append(input)
-	winUser.SendInput(inputs)
+			last.ii.ki.dwFlags = winUser.KEYEVENTF_KEYUP
+		else:
+			first.ii.ki.dwFlags = winUser.KEYEVENTF_KEYUP
+	winUser.user32.SendInput(n, inputs, ctypes.sizeof(winUser.Input))
 
 
 def willAutoStart(autoStartContext: AutoStartContext) -> bool:
@@ -123,7 +124,16 @@ def _getAutoStartConfiguration(autoStartContext: AutoStartContext) -> List[str]:
 	except WindowsError:
 		log.error(f"Unable to open {autoStartContext} {RegistryKey.ROOT} for reading", exc_info=True)
 		return []
+	with k:
+		return _queryAutoStartConfiguration(k, autoStartContext)
+
 
+def _queryAutoStartConfiguration(k: winreg.HKEYType, autoStartContext: AutoStartContext) -> List[str]:
+	"""Returns the list of app names which start automatically,
+	read from k, an already opened handle to RegistryKey.ROOT for autoStartContext.
+
+	Returns an empty list on failure.
+	"""
 	try:
 		conf: List[str] = winreg.QueryValueEx(k, "Configuration")[0].split(",")
 	except FileNotFoundError:
@@ -148,23 +158,30 @@ def setAutoStart(autoStartContext: AutoStartContext, enable: bool) -> None:
 
 	Raises `Union[WindowsError, FileNotFoundError]`
 	"""
-	conf = _getAutoStartConfiguration(autoStartContext)
-	currentlyEnabled = _APP_KEY_NAME in conf
-	changed = False
-
-	if enable and not currentlyEnabled:
-		conf.append(_APP_KEY_NAME)
-		changed = True
-	elif not enable and currentlyEnabled:
-		conf.remove(_APP_KEY_NAME)
-		changed = True
-
-	if changed:
+	try:
 		k = winreg.OpenKey(
 			autoStartContext.value,
 			RegistryKey.ROOT.value,
 			0,
 			winreg.KEY_READ | winreg.KEY_WRITE | winreg.KEY_WOW64_64KEY
 		)
-		winreg.SetValueEx(k, "Configuration", None, winreg.REG_SZ,
-			",".join(conf))
+	except WindowsError:
+		# Failing to open the key for writing is only an error if the configuration needs to change.
+		# E.g. when disabling, a missing key means there is nothing to disable.
+		if willAutoStart(autoStartContext) != enable:
+			raise
+		return
+	with k:
+		conf = _queryAutoStartConfiguration(k, autoStartContext)
+		currentlyEnabled = _APP_KEY_NAME in conf
+		changed = False
+
+		if enable and not currentlyEnabled:
+			conf.append(_APP_KEY_NAME)
+			changed = True
+		elif not enable and currentlyEnabled:
+			conf.remove(_APP_KEY_NAME)
+			changed = True
+
+		if changed:
+			winreg.SetValueEx(k, "Configuration", None, winreg.REG_SZ, ",".join(conf))